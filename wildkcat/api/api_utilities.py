@@ -1,35 +1,49 @@
+import random
 import requests
 import logging 
 from time import sleep
-from functools import wraps
+from functools import wraps, lru_cache
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
-def retry_api(max_retries=4, backoff_factor=2):
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def retry_api(max_retries=4, backoff_factor=2, max_delay=30):
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
             delay = 2
             for attempt in range(max_retries):
+                retry_after = None
                 try:
                     return func(*args, **kwargs)
 
-                except requests.exceptions.ConnectionError as e:
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
                     logging.warning(
-                        f"Connection error ({e}), retry {attempt+1}/{max_retries}"
+                        f"Connection error or timeout ({e}), retry {attempt+1}/{max_retries}"
                     )
 
                 except requests.exceptions.HTTPError as e:
                     status = e.response.status_code
-                    if status in {502, 503, 504}:
+                    if status in RETRY_STATUS_CODES:
                         logging.warning(
                             f"HTTP {status} error, retry {attempt+1}/{max_retries}"
                         )
+                        retry_after = e.response.headers.get("Retry-After")
                     else:
                         logging.error(f"HTTP error (no retry): {e}")
                         return None
 
-                sleep(delay)
-                delay *= backoff_factor
+                if attempt + 1 < max_retries:
+                    # Honor the delay requested by the server, otherwise back off with jitter
+                    if retry_after is not None and retry_after.isdigit():
+                        sleep(min(int(retry_after), max_delay))
+                    else:
+                        sleep(min(delay, max_delay) * random.uniform(0.5, 1))
+                    delay *= backoff_factor
 
             logging.error(f"Request failed after {max_retries} retries.")
             return None
@@ -37,7 +51,51 @@ def retry_api(max_retries=4, backoff_factor=2):
         return wrapper
     return decorator
 
+@lru_cache(maxsize=None)
+def get_session() -> requests.Session:
+    """
+    Returns the HTTP session shared by the API calls, so that the connections to each host are kept alive and reused 
+    instead of opening a new TCP/TLS connection for every request.
+
+    Returns:
+        requests.Session: The shared session, with a connection pool large enough for concurrent requests.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
 def safe_requests_get(url, timeout=10):
-    response = requests.get(url, timeout=timeout)
+    response = get_session().get(url, timeout=timeout)
     response.raise_for_status()
-    return response
\ No newline at end of file
+    return response
+
+
+def fetch_concurrently(func, keys, max_workers=4, desc=None) -> dict:
+    """
+    Calls an I/O-bound function (e.g. an API query) on each unique key using a pool of threads, 
+    so that the latency of the requests overlaps instead of adding up.
+
+    Parameters:
+        func (callable): Function taking a single key and returning a value.
+        keys (iterable): Keys to query. Duplicated keys are only queried once.
+        max_workers (int, optional): Maximum number of concurrent requests (default: 4).
+        desc (str, optional): Description of the progress bar, no progress bar is shown if None (default: None).
+
+    Returns:
+        dict: Mapping of each key to the value returned by func, or None if the call raised an exception.
+    """
+    unique_keys = list(dict.fromkeys(keys))
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(func, key): key for key in unique_keys}
+        for future in tqdm(as_completed(futures), total=len(futures), desc=desc, disable=desc is None):
+            key = futures[future]
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                logging.warning(f"{key}: Request failed ({e})")
+                results[key] = None
+    return {key: results[key] for key in unique_keys}
@@ -1,9 +1,10 @@
-import requests
 import logging
 import pandas as pd 
 from io import StringIO
 from functools import lru_cache 
 
+from .api_utilities import get_session
+
 
 # --- Sabio-RK API ---
 
@@ -26,7 +27,7 @@ def get_turnover_number_sabio(ec_number) -> pd.DataFrame:
     query = {'format': 'txt', 'q': f'Parametertype:"kcat" AND ECNumber:"{ec_number}"'}
     
     # Make GET request
-    request = requests.get(base_url, params=query)
+    request = get_session().get(base_url, params=query)
     request.raise_for_status()
     if request.text == "no data found":
         logging.warning('%s: No data found for the query in SABIO-RK.' % f"{ec_number}")
@@ -52,7 +53,7 @@ def get_enzyme_sabio(uniprot_id) -> pd.DataFrame:
     query = {'format': 'txt', 'q': f'Parametertype:"kcat" AND UniProtKB_AC:"{uniprot_id}"'}
 
     # Make GET request
-    request = requests.get(base_url, params=query)
+    request = get_session().get(base_url, params=query)
     request.raise_for_status()
     if request.text == "no data found":
         logging.warning('%s: No data found for the query in SABIO-RK.' % f"{uniprot_id}")
@@ -86,7 +87,7 @@ def query_sabio(entryIDs) -> pd.DataFrame:
                                          'Parameter']}
 
     # Make POST request
-    request = requests.post(parameters, params=query, data=data_field)
+    request = get_session().post(parameters, params=query, data=data_field)
     request.raise_for_status()
 
     # Format the response into a DataFrame
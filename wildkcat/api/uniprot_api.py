@@ -1,15 +1,22 @@
-import requests
+import re
 import logging
 from functools import lru_cache
+from urllib.parse import urlencode
+
+from .api_utilities import safe_requests_get, retry_api, fetch_concurrently, get_session
+
+
+UNIPROT_ACCESSION_PATTERN = re.compile(r'[OPQ][0-9][A-Z0-9]{3}[0-9]|[A-NR-Z][0-9]([A-Z][A-Z0-9]{2}[0-9]){1,2}')
+SEQUENCE_CACHE = {}  # Sequences retrieved from UniProt (None for unknown accessions), shared by the single and batch lookups
 
 
 # --- UniProt API ---
 
 
-@lru_cache(maxsize=None)
 def convert_uniprot_to_sequence(uniprot_id) -> str | None:
     """
     Convert a UniProt accession ID to its corresponding amino acid sequence.
+    The result is cached, unless the request failed.
 
     Parameters:
         uniprot_id (str): The UniProt accession ID.
@@ -17,17 +24,65 @@ def convert_uniprot_to_sequence(uniprot_id) -> str | None:
     Returns:
         str: The amino acid sequence, or None if not found.
     """
+    if uniprot_id in SEQUENCE_CACHE:
+        return SEQUENCE_CACHE[uniprot_id]
     url = f"https://rest.uniprot.org/uniprotkb/{uniprot_id}.fasta"
-    response = requests.get(url)
+    response = retry_api()(_get_fasta)(url)
 
-    if response.status_code == 200:
-        fasta = response.text
-        lines = fasta.splitlines()
-        sequence = ''.join(lines[1:])  # Skip the header
-        return sequence
-    else:
+    if response is None:
         # logging.warning(f"Failed to retrieve sequence for UniProt ID {uniprot_id}")
         return None
+    sequence = None
+    if response.status_code != 404:
+        _, _, fasta = response.content.partition(b'\n')  # Skip the header
+        sequence = fasta.replace(b'\n', b'').decode('ascii')
+    SEQUENCE_CACHE[uniprot_id] = sequence
+    return sequence
+
+
+def _get_fasta(url):
+    """Same as safe_requests_get, but an unknown accession (404) is returned instead of being logged as an error."""
+    response = get_session().get(url, timeout=10)
+    if response.status_code != 404:
+        response.raise_for_status()
+    return response
+
+
+def convert_uniprots_to_sequences(uniprot_ids, batch_size=100, desc="Retrieving UniProt sequences") -> dict:
+    """
+    Convert UniProt accession IDs to their amino acid sequences, querying the UniProt stream endpoint by batches of IDs.
+    The IDs that are not plain accessions (e.g. isoforms) or not returned by the batch queries are retrieved one by one. 
+    The sequences are stored in the cache of convert_uniprot_to_sequence, so each sequence is only retrieved once.
+
+    Parameters:
+        uniprot_ids (iterable): The UniProt accession IDs.
+        batch_size (int, optional): Number of IDs per request (default: 100).
+        desc (str, optional): Description of the progress bar of the one by one retrieval, no progress bar is shown if None.
+
+    Returns:
+        dict: Mapping UniProt ID <-> amino acid sequence (None if not found).
+    """
+    uniprot_ids = list(dict.fromkeys(uniprot_ids))
+    new_ids = [uniprot_id for uniprot_id in uniprot_ids if uniprot_id not in SEQUENCE_CACHE]
+    # Only valid accessions go in the batch queries, a malformed one would make UniProt reject the whole batch
+    batch_ids = [uniprot_id for uniprot_id in new_ids if UNIPROT_ACCESSION_PATTERN.fullmatch(str(uniprot_id))]
+    safe_get_with_retry = retry_api()(safe_requests_get)
+    for start in range(0, len(batch_ids), batch_size):
+        batch = batch_ids[start:start + batch_size]
+        query = " OR ".join(f"accession:{uniprot_id}" for uniprot_id in batch)
+        url = f"https://rest.uniprot.org/uniprotkb/stream?{urlencode({'query': query, 'format': 'fasta'})}"
+        response = safe_get_with_retry(url, timeout=60)
+        if response is None:
+            continue
+        for entry in response.content.split(b'>')[1:]:
+            header, _, sequence = entry.partition(b'\n')
+            SEQUENCE_CACHE[header.split(b'|')[1].decode('ascii')] = sequence.replace(b'\n', b'').decode('ascii')
+
+    sequences = {uniprot_id: SEQUENCE_CACHE.get(uniprot_id) for uniprot_id in uniprot_ids}
+    missing_ids = [uniprot_id for uniprot_id in new_ids if uniprot_id not in SEQUENCE_CACHE]
+    if missing_ids:
+        sequences.update(fetch_concurrently(convert_uniprot_to_sequence, missing_ids, desc=desc))
+    return sequences
 
 
 @lru_cache(maxsize=None)
@@ -42,9 +97,10 @@ def catalytic_activity(uniprot_id) -> list[str] | None:
         list[str] or None: A list of EC numbers if found, otherwise None.
     """
     url = f"https://rest.uniprot.org/uniprotkb/{uniprot_id}?fields=cc_catalytic_activity"
-    response = requests.get(url)
+    safe_get_with_retry = retry_api()(safe_requests_get)
+    response = safe_get_with_retry(url)
 
-    if response.status_code == 200:
+    if response is not None:
         data = response.json()
         ec_numbers = []
         for comment in data.get('comments', []):
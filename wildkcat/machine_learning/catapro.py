@@ -2,141 +2,160 @@ import logging
 import pandas as pd 
 from tqdm import tqdm
 import re
-from functools import lru_cache
+from io import StringIO
 
 from wildkcat.api.api_utilities import safe_requests_get, retry_api
-from wildkcat.api.uniprot_api import convert_uniprot_to_sequence, identify_catalytic_enzyme
+from wildkcat.api.uniprot_api import convert_uniprot_to_sequence, convert_uniprots_to_sequences, identify_catalytic_enzyme
 from wildkcat.api.brenda_api import get_cofactor
 
 
 # TODO: Add a list of cofactors 
 
 
+PUBCHEM_SID_PATTERN = re.compile(rb'pubchem:\s*(\d+)')
+
+
 # --- API ---
 
 
-def convert_kegg_compound_to_sid(kegg_compound_id) -> str | None:
+def convert_keggs_to_sids(kegg_compound_ids, batch_size=100) -> dict:
     """
-    Convert the KEGG compound ID to the PubChem Substance ID (SID).
+    Converts KEGG compound IDs to PubChem Substance IDs (SIDs), querying KEGG by batches of compounds.
 
     Parameters:
-        kegg_compound_id (str): KEGG compound ID.
+        kegg_compound_ids (iterable): KEGG compound IDs.
+        batch_size (int, optional): Number of compounds per request (default: 100, the KEGG limit).
 
     Returns:
-        str: The PubChem SID if found, otherwise None.
+        dict: Mapping KEGG ID <-> PubChem SID, for the compounds found.
     """
-    url = f"https://rest.kegg.jp/conv/pubchem/compound:{kegg_compound_id}"
+    kegg_compound_ids = list(dict.fromkeys(kegg_compound_ids))
+    kegg_to_sid = {}
     safe_get_with_retry = retry_api()(safe_requests_get)
-    response = safe_get_with_retry(url)
-
-    if response is None:
-        return None
-
-    if response.status_code != 200:
-        return None
-
-    match = re.search(r'pubchem:\s*(\d+)', response.text)
-    sid = match.group(1) if match else None
-    return sid
+    for start in range(0, len(kegg_compound_ids), batch_size):
+        batch = kegg_compound_ids[start:start + batch_size]
+        url = f"https://rest.kegg.jp/conv/pubchem/{'+'.join(f'cpd:{kegg_id}' for kegg_id in batch)}"
+        response = safe_get_with_retry(url)
+        if response is None:
+            continue
+        for line in response.content.splitlines():
+            compound, _, pubchem = line.partition(b'\t')
+            match = PUBCHEM_SID_PATTERN.search(pubchem)
+            if match:
+                kegg_to_sid.setdefault(compound.split(b':', 1)[-1].decode(), match.group(1).decode())
+    return kegg_to_sid
 
 
-def convert_sid_to_cid(sid) -> int | None:
+def convert_sids_to_cids(sids, batch_size=200) -> dict:
     """
-    Converts a PubChem Substance ID (SID) to the corresponding Compound ID (CID).
+    Converts PubChem Substance IDs (SIDs) to the corresponding Compound IDs (CIDs), querying PubChem by batches of SIDs.
 
     Parameters:
-        sid (str): PubChem Substance ID.
+        sids (iterable): PubChem Substance IDs.
+        batch_size (int, optional): Number of SIDs per request (default: 200).
 
     Returns:
-        int or None: The corresponding PubChem Compound ID (CID), or None if not found.
+        dict: Mapping SID <-> PubChem CID, for the substances found.
     """
-    url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/substance/sid/{sid}/cids/JSON"
+    sids = list(dict.fromkeys(sids))
+    sid_to_cid = {}
     safe_get_with_retry = retry_api()(safe_requests_get)
-    response = safe_get_with_retry(url)
-    
-    if response is None:
-        return None
-
-    if response.status_code == 200:
-        try:
-            cid = response.json()['InformationList']['Information'][0]['CID'][0]
-        except (KeyError, IndexError):
-            cid = None
-    return cid
+    for start in range(0, len(sids), batch_size):
+        batch = sids[start:start + batch_size]
+        url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/substance/sid/{','.join(map(str, batch))}/cids/JSON"
+        response = safe_get_with_retry(url)
+        if response is None:
+            continue
+        for information in response.json().get('InformationList', {}).get('Information', []):
+            if information.get('CID'):
+                sid_to_cid[str(information['SID'])] = information['CID'][0]
+    return sid_to_cid
 
 
-def convert_cid_to_smiles(cid) -> list | None:    
+def convert_cids_to_smiles(cids, batch_size=200) -> dict:
     """
-    Converts a PubChem Compound ID (CID) to its corresponding SMILES representation.
+    Converts PubChem Compound IDs (CIDs) to their SMILES representation, querying PubChem by batches of CIDs.
 
     Parameters:
-        cid (str): PubChem Compound ID.
+        cids (iterable): PubChem Compound IDs.
+        batch_size (int, optional): Number of CIDs per request (default: 200).
 
     Returns:
-       list or None: A list of SMILES strings if found, otherwise None.
+        dict: Mapping CID <-> list of SMILES strings, for the CIDs found.
     """
-    url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/cid/{cid}/property/smiles/txt"
-    try:
-        safe_get_with_retry = retry_api()(safe_requests_get)
+    cids = list(dict.fromkeys(cids))
+    cid_to_smiles = {}
+    safe_get_with_retry = retry_api()(safe_requests_get)
+    for start in range(0, len(cids), batch_size):
+        batch = cids[start:start + batch_size]
+        url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/cid/{','.join(map(str, batch))}/property/smiles/csv"
         response = safe_get_with_retry(url)
-
         if response is None:
-            return None
-
-        response.raise_for_status()
-        smiles = response.text.strip().split('\n')
-        return smiles
-    except:
-        return None
+            continue
+        smiles_df = pd.read_csv(StringIO(response.text), dtype={'SMILES': str})
+        for cid, smiles in zip(smiles_df['CID'], smiles_df['SMILES']):
+            if pd.notna(smiles):
+                cid_to_smiles.setdefault(cid, []).append(smiles)
+    return cid_to_smiles
 
 
-@lru_cache(maxsize=None)
-def convert_kegg_to_smiles(kegg_compound_id) -> list | None:
+def convert_keggs_to_smiles(kegg_compound_ids) -> dict:
     """
-    Convert the KEGG compound ID to the PubChem Compound ID (CID).
+    Convert KEGG compound IDs to their SMILES representation. 
+    Each conversion step (KEGG -> SID -> CID -> SMILES) is done by batches of IDs.
 
     Parameters:
-        kegg_compound_id (str): KEGG compound ID.
+        kegg_compound_ids (iterable): KEGG compound IDs.
 
     Returns:
-        list or None: A list of SMILES strings if found, otherwise None.
+        dict: Mapping KEGG ID <-> list of SMILES strings (None if not found).
     """
-    sid = convert_kegg_compound_to_sid(kegg_compound_id)
-    if sid is None:
-        logging.warning('%s: Failed to retrieve SID for KEGG compound ID' % (kegg_compound_id))
-        return None
-    cid = convert_sid_to_cid(sid)
-    if cid is None:
-        logging.warning('%s: Failed to retrieve CID for KEGG compound ID' % (kegg_compound_id))
-        return None
-    smiles = convert_cid_to_smiles(cid)
-    if smiles is None:
-        logging.warning('%s: Failed to retrieve SMILES for KEGG compound ID' % (kegg_compound_id))
-        return None
-    return smiles
+    kegg_compound_ids = list(dict.fromkeys(kegg_compound_ids))
+    kegg_to_sid = convert_keggs_to_sids(kegg_compound_ids)
+    sid_to_cid = convert_sids_to_cids(kegg_to_sid.values())
+    cid_to_smiles = convert_cids_to_smiles(sid_to_cid.values())
+
+    kegg_to_smiles = {}
+    for kegg_compound_id in kegg_compound_ids:
+        sid = kegg_to_sid.get(kegg_compound_id)
+        cid = sid_to_cid.get(sid)
+        smiles = cid_to_smiles.get(cid)
+        if sid is None:
+            logging.warning('%s: Failed to retrieve SID for KEGG compound ID' % (kegg_compound_id))
+        elif cid is None:
+            logging.warning('%s: Failed to retrieve CID for KEGG compound ID' % (kegg_compound_id))
+        elif smiles is None:
+            logging.warning('%s: Failed to retrieve SMILES for KEGG compound ID' % (kegg_compound_id))
+        kegg_to_smiles[kegg_compound_id] = smiles
+    return kegg_to_smiles
     
 
 # --- Create CataPro input file ---
 
 
-def create_catapro_input_file(kcat_df):
+def create_catapro_input_file(kcat_df, known_smiles=None):
     """
     Generate CataPro input file and a mapping of substrate KEGG IDs to SMILES.
 
     Parameters: 
         kcat_df (pd.DataFrame): Input DataFrame containing kcat information.
+        known_smiles (dict, optional): Mapping KEGG ID <-> SMILES from a previous run, these substrates are not queried again.
 
     Returns:
         catapro_input_df (pd.DataFrame): DataFrame for CataPro input.
         substrates_to_smiles (dict): Mapping KEGG ID <-> SMILES.
     """
-    catapro_input = []
+    enzyme_ids, sequences, smiles_col = [], [], []
     substrates_to_smiles = {}
+    reactions = []
+
+    # Retrieve the sequences of the single enzymes at once, by batches
+    uniprot_to_sequence = convert_uniprots_to_sequences(uniprot for uniprot in kcat_df['uniprot'] if ';' not in uniprot)
 
     counter_no_catalytic, counter_kegg_no_matching, counter_rxn_covered, counter_cofactor = 0, 0, 0, 0
-    for _, row in tqdm(kcat_df.iterrows(), total=len(kcat_df), desc="Generating CataPro input"):
-        uniprot = row['uniprot']
-        ec_code = row['ec_code']
+    for row in tqdm(kcat_df.itertuples(index=False), total=len(kcat_df), desc="Generating CataPro input"):
+        uniprot = row.uniprot
+        ec_code = row.ec_code
 
         if len(uniprot.split(';')) > 1:       
             catalytic_enzyme = identify_catalytic_enzyme(uniprot, ec_code)
@@ -147,47 +166,63 @@ def create_catapro_input_file(kcat_df):
                 uniprot = catalytic_enzyme
                 
         # If the number of KEGG Compound IDs is not matching the number of names  
-        if len([s for s in row['substrates_kegg'].split(';') if s]) != len(row['substrates_name'].split(';')):
+        if len([s for s in row.substrates_kegg.split(';') if s]) != len(row.substrates_name.split(';')):
             logging.warning(f"Number of KEGG compounds IDs does not match number of names for {ec_code}: {uniprot}.")
             counter_kegg_no_matching += 1
             # continue
 
-        sequence = convert_uniprot_to_sequence(uniprot) 
+        if uniprot in uniprot_to_sequence:
+            sequence = uniprot_to_sequence[uniprot]
+        else:
+            sequence = convert_uniprot_to_sequence(uniprot) 
         if sequence is None:
             continue
         
-        smiles_list = []
-        names = row['substrates_name'].split(';')
-        kegg_ids = row['substrates_kegg'].split(';')
+        substrates = []
+        names = row.substrates_name.split(';')
+        kegg_ids = row.substrates_kegg.split(';')
         
         # Get the cofactor for the EC code
-        cofactor = get_cofactor(ec_code) 
+        cofactor = {c.lower() for c in get_cofactor(ec_code)}
 
         for name, kegg_compound_id in zip(names, kegg_ids):
             if kegg_compound_id == '':
                 continue
-            if name.lower() in [c.lower() for c in cofactor]:  # TODO: Should we add a warning if no cofactor is found for a reaction? 
+            if name.lower() in cofactor:  # TODO: Should we add a warning if no cofactor is found for a reaction? 
                 counter_cofactor += 1
                 continue
-            smiles = convert_kegg_to_smiles(kegg_compound_id)
+            substrates.append(kegg_compound_id)
+
+        reactions.append((uniprot, sequence, substrates))
+
+    # Resolve the SMILES of all the substrates (cofactors excluded) at once
+    kegg_to_smiles = {kegg_id: [smiles] for kegg_id, smiles in (known_smiles or {}).items()}
+    kegg_to_smiles.update(convert_keggs_to_smiles(
+        kegg_id for _, _, substrates in reactions for kegg_id in substrates if kegg_id not in kegg_to_smiles
+    ))
+
+    for uniprot, sequence, substrates in reactions:
+        smiles_list = []
+        for kegg_compound_id in substrates:
+            smiles = kegg_to_smiles.get(kegg_compound_id)
             if smiles is not None:
                 smiles_str = smiles[0]  # TODO: If multiple SMILES, take the first one ? 
                 smiles_list.append(smiles_str)
                 substrates_to_smiles[kegg_compound_id] = smiles_str
 
-        if len(smiles_list) > 0:
-            for smiles in smiles_list:
-                catapro_input.append({
-                    "Enzyme_id": uniprot,
-                    "type": "wild",
-                    "sequence": sequence,
-                    "smiles": smiles
-                })
+        enzyme_ids.extend([uniprot] * len(smiles_list))
+        sequences.extend([sequence] * len(smiles_list))
+        smiles_col.extend(smiles_list)
         
         counter_rxn_covered += 1
 
     # Generate CataPro input file
-    catapro_input_df = pd.DataFrame(catapro_input)
+    catapro_input_df = pd.DataFrame({
+        "Enzyme_id": enzyme_ids,
+        "type": "wild",
+        "sequence": sequences,
+        "smiles": smiles_col
+    })
     # Remove duplicates
     before_duplicates_filter = len(catapro_input_df)
     catapro_input_df = catapro_input_df.drop_duplicates().reset_index(drop=True)
@@ -197,7 +232,7 @@ def create_catapro_input_file(kcat_df):
     catapro_input_df = catapro_input_df[(catapro_input_df['sequence'].str.strip() != '') & (catapro_input_df['smiles'].str.strip() != '')]
 
     # Generate reverse mapping from SMILES to KEGG IDs as TSV
-    substrates_to_smiles_df = pd.DataFrame(list(substrates_to_smiles.items()), columns=['kegg_id', 'smiles'])
+    substrates_to_smiles_df = pd.DataFrame({'kegg_id': list(substrates_to_smiles), 'smiles': list(substrates_to_smiles.values())})
 
     report_statistics = {
         "rxn_covered": counter_rxn_covered,
@@ -239,26 +274,20 @@ def integrate_catapro_predictions(kcat_df, substrates_to_smiles, catapro_predict
     )
     catapro_predictions_df['substrates_kegg'] = catapro_predictions_df['smiles'].map(smiles_to_kegg)
     
-    catapro_map = catapro_predictions_df.set_index(['uniprot', 'substrates_kegg'])['kcat_s'].to_dict()
-
-    def get_min_pred_kcat(row):
-        uniprot = row['uniprot']
-        kegg_ids = str(row['substrates_kegg']).split(';')
-        kcat_values = [
-            catapro_map.get((uniprot, kegg_id))
-            for kegg_id in kegg_ids
-            if (uniprot, kegg_id) in catapro_map
-        ]
-        return min(kcat_values) if kcat_values else None  # If multiple substrates, take the minimum kcat value
-
-    kcat_df['catapro_predicted_kcat_s'] = kcat_df.apply(get_min_pred_kcat, axis=1)
+    catapro_kcat = (
+        catapro_predictions_df.dropna(subset=['substrates_kegg'])
+        .drop_duplicates(subset=['uniprot', 'substrates_kegg'], keep='last')
+        .set_index(['uniprot', 'substrates_kegg'])['kcat_s']
+    )
+
+    # Look up the prediction of each (enzyme, substrate) pair, if multiple substrates, take the minimum kcat value
+    pairs = kcat_df[['uniprot']].assign(substrates_kegg=kcat_df['substrates_kegg'].astype(str).str.split(';')).explode('substrates_kegg')
+    pairs_kcat = catapro_kcat.reindex(pd.MultiIndex.from_frame(pairs)).to_numpy()
+    kcat_df['catapro_predicted_kcat_s'] = pd.Series(pairs_kcat, index=pairs.index).groupby(level=0).min()
     return kcat_df
 
 
 # if __name__ == "__main__":
-    # Test : Retrieve SMILES from KEGG ID
-    # print(convert_kegg_to_smiles("C00008"))
-
     # Test : Retrieve Sequence from UniProt ID
     # print(convert_uniprot_to_sequence("P0A796"))
 
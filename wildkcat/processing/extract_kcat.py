@@ -2,9 +2,9 @@ import re
 import os 
 import logging
 import datetime 
+import itertools
 import pandas as pd
 from tqdm import tqdm
-from functools import lru_cache
 from cobra.io import load_json_model, load_matlab_model, read_sbml_model
 
 from ..api.api_utilities import safe_requests_get, retry_api
@@ -13,6 +13,18 @@ from ..utils.manage_warnings import DedupFilter
 from ..utils.generate_reports import report_extraction
 
 
+EC_CODE_PATTERN = re.compile(r"^\d+\.\d+\.\d+\.\d+$")
+
+EC_TRANSFERRED_CACHE = {}  # Transfer status of the EC codes successfully checked in KEGG
+
+KCAT_COLUMNS = [
+    "rxn", "rxn_kegg", "ec_code", "direction",
+    "substrates_name", "substrates_kegg", "products_name", "products_kegg",
+    "genes", "uniprot", "catalytic_enzyme",
+    "warning_ec", "warning_enz"
+]
+
+
 # --- Load Model ---
 
 
@@ -39,10 +51,10 @@ def read_model(model_path: str):
 # --- KEGG API --- 
 
 
-@lru_cache(maxsize=None)
 def is_ec_code_transferred(ec_code):
     """
     Checks if a given EC code has been transferred according to the KEGG database.
+    Only successful lookups are cached, so a failed request is tried again for the next reaction.
 
     Parameters:
         ec_code (str): The EC code to check (e.g., '1.1.1.1').
@@ -56,20 +68,57 @@ def is_ec_code_transferred(ec_code):
     Logs:
         A warning if the EC code has been transferred.
     """
+    if ec_code in EC_TRANSFERRED_CACHE:
+        return EC_TRANSFERRED_CACHE[ec_code]
     url = f'https://rest.kegg.jp/list/{ec_code}'
     safe_get_with_retry = retry_api(max_retries=4, backoff_factor=2)(safe_requests_get)
     response = safe_get_with_retry(url)
     if not response:
         return None
-    if "Transferred to" in response.text:
+    is_transferred = "Transferred to" in response.text
+    if is_transferred:
         logging.warning(f"EC code {ec_code} transferred to {response.text.split('Transferred to', 1)[1].lower().strip()}")
-        return True
-    return False
+    EC_TRANSFERRED_CACHE[ec_code] = is_transferred
+    return is_transferred
 
 
 # --- Generate kcat output ---
 
 
+def _reaction_ec_codes(annotation):
+    """
+    Returns the EC codes of a reaction annotation as a list, with a single empty string if no EC code is set.
+    """
+    ec_codes = annotation.get("ec-code")
+    if isinstance(ec_codes, str):
+        return [ec_codes]
+    if not ec_codes:
+        return [""]
+    return ec_codes
+
+
+def check_ec_code(ec_code):
+    """
+    Checks the validity of an EC code and returns the corresponding warning.
+    An EC code that cannot be checked in KEGG is reported as transferred.
+
+    Parameters:
+        ec_code (str): The EC code to check (e.g., '1.1.1.1'), or an empty string if missing.
+
+    Returns:
+        str: 'missing', 'incomplete', 'transferred', or an empty string if the EC code is valid.
+    """
+    if not ec_code:
+        return "missing"
+    if not EC_CODE_PATTERN.match(ec_code):
+        logging.warning(f"EC code {ec_code} is not in the correct format")
+        return "incomplete"
+    is_transferred = is_ec_code_transferred(ec_code)
+    if is_transferred or is_transferred is None:
+        return "transferred"
+    return ""
+
+
 def parse_gpr(gpr_str):
     """
     Parses a Gene-Protein-Reaction (GPR) rule string into a list of gene groups.
@@ -109,18 +158,45 @@ def split_metabolites(metabolites):
             - names (list of str): Names or IDs of substrate metabolites (where coefficient < 0).
             - kegg_ids (list of str): Corresponding KEGG compound IDs for each substrate metabolite. If not available, an empty string is used.
     """
-    names, kegg_ids = [], []
-    for m, coeff in metabolites.items():
-        if coeff < 0:  # substrate
-            name = m.name if m.name else m.id
-            kegg = m.annotation.get("kegg.compound")
-            if isinstance(kegg, list):
-                kegg = kegg[0]
-            names.append(name)
-            kegg_ids.append(kegg if kegg else "")
+    substrates = [_metabolite_name_kegg(m) for m, coeff in metabolites.items() if coeff < 0]
+    names = [name for name, _ in substrates]
+    kegg_ids = [kegg for _, kegg in substrates]
     return names, kegg_ids
 
 
+def _metabolite_name_kegg(metabolite):
+    """
+    Returns the name (or ID if no name is set) and the first KEGG compound ID of a metabolite.
+
+    Parameters:
+        metabolite (cobra.Metabolite): The metabolite object.
+
+    Returns:
+        tuple: (name, kegg_id), where kegg_id is an empty string if not available.
+    """
+    name = metabolite.name if metabolite.name else metabolite.id
+    kegg = metabolite.annotation.get("kegg.compound")
+    if isinstance(kegg, list):
+        kegg = kegg[0]
+    return name, kegg if kegg else ""
+
+
+def _gene_uniprot_ids(gene):
+    """
+    Returns the UniProt IDs annotated on a gene.
+
+    Parameters:
+        gene (cobra.Gene): The gene object.
+
+    Returns:
+        list: The UniProt IDs of the gene, empty if not available.
+    """
+    uniprot = gene.annotation.get("uniprot")
+    if not uniprot:
+        return []
+    return uniprot if isinstance(uniprot, list) else [uniprot]
+
+
 def create_kcat_output(model):
     """
     Generates a DataFrame summarizing kcat-related information for each reaction in a metabolic model.
@@ -137,101 +213,51 @@ def create_kcat_output(model):
             - rxn, rxn_kegg, ec_code, direction, substrates/products names & KEGG IDs, genes, uniprot, catalytic_enzyme, warning_ec, warning_enz
         report_statistics (dict): A dictionary with statistics for the report, including the number of incomplete/incorrect EC codes and EC for which kcat values were transferred.
     """
-    rows = []
-    ec_pattern = re.compile(r"^\d+\.\d+\.\d+\.\d+$")
+    rows, reversible = [], []
+
+    # Metabolites are shared between reactions, resolve their annotations once
+    metabolite_info = {m.id: _metabolite_name_kegg(m) for m in model.metabolites}
+    gene_uniprot = {gene.id: _gene_uniprot_ids(gene) for gene in model.genes}
 
     for rxn in tqdm(model.reactions, desc=f"Processing {model.id} reactions"):
-        kegg_rxn_id = rxn.annotation.get("kegg.reaction")
+        rxn_id = rxn.id
+        annotation = rxn.annotation
+        kegg_rxn_id = annotation.get("kegg.reaction")
         if isinstance(kegg_rxn_id, list):
             kegg_rxn_id = ";".join(kegg_rxn_id)
 
-        ec_codes = rxn.annotation.get("ec-code")
-        if isinstance(ec_codes, str):
-            ec_codes = [ec_codes]
-        elif not ec_codes:
-            ec_codes = [""]
+        ec_codes = _reaction_ec_codes(annotation)
 
         # Extract substrates and products
-        subs_names, subs_keggs, prod_names, prod_keggs = [], [], [], []
-        for m, coeff in rxn.metabolites.items():
-            name = m.name if m.name else m.id
-            kegg = m.annotation.get("kegg.compound")
-            if isinstance(kegg, list):
-                kegg = kegg[0]
-            if coeff < 0:
-                subs_names.append(name)
-                subs_keggs.append(kegg if kegg else "")
-            elif coeff > 0:
-                prod_names.append(name)
-                prod_keggs.append(kegg if kegg else "")
-
-        # Parse GPR
-        gpr_groups = parse_gpr(rxn.gene_reaction_rule)
-
-        for ec in ec_codes:
-            warning_ec = ""
-
-            # Check EC code validity (if present)
-            if ec:
-                if not ec_pattern.match(ec):
-                    warning_ec = "incomplete"
-                    logging.warning(f"EC code {ec} is not in the correct format")
-                    
-                if warning_ec != "incomplete":
-                    is_transferred = is_ec_code_transferred(ec)
-                    if is_transferred or is_transferred is None:
-                        warning_ec = "transferred"
+        metabolites = list(rxn.metabolites.items())
+        substrates = [metabolite_info[m.id] for m, coeff in metabolites if coeff < 0]
+        products = [metabolite_info[m.id] for m, coeff in metabolites if coeff > 0]
+        subs_names = ";".join(name for name, _ in substrates)
+        subs_keggs = ";".join(kegg for _, kegg in substrates)
+        prod_names = ";".join(name for name, _ in products)
+        prod_keggs = ";".join(kegg for _, kegg in products)
+
+        # Parse GPR and resolve the UniProt IDs of each gene group
+        gene_groups = []
+        for genes_group in parse_gpr(rxn.gene_reaction_rule):
+            genes_group = [g.strip() for g in genes_group if g.strip()]
+            uniprot_ids = list({uniprot for gene in genes_group for uniprot in gene_uniprot.get(gene, ())})
+            gene_groups.append((";".join(genes_group), uniprot_ids, ";".join(uniprot_ids)))
+
+        # Check EC codes validity (if present)
+        ec_entries = [(ec, check_ec_code(ec)) for ec in ec_codes]
+
+        # Without GPR, the reaction is emitted once per EC code with no enzyme
+        for (ec, warning_ec), gene_group in itertools.product(ec_entries, gene_groups or [None]):
+            if gene_group is None:
+                genes_str, uniprot_str, catalytic_enzyme, warning_enz = "", "", "", "no_gpr"
             else:
-                warning_ec = "missing"
-                
-            # If no GPR 
-            if not gpr_groups:
-                for direction, sn, sk, pn, pk in (
-                    [("forward", subs_names, subs_keggs, prod_names, prod_keggs),
-                     ("reverse", prod_names, prod_keggs, subs_names, subs_keggs)]
-                    if rxn.reversibility else
-                    [("forward", subs_names, subs_keggs, prod_names, prod_keggs)]
-                ):
-                    rows.append({
-                        "rxn": rxn.id,
-                        "rxn_kegg": kegg_rxn_id,
-                        "ec_code": ec,
-                        "direction": direction,
-                        "substrates_name": ";".join(sn),
-                        "substrates_kegg": ";".join(sk),
-                        "products_name": ";".join(pn),
-                        "products_kegg": ";".join(pk),
-                        "genes": "",
-                        "uniprot": "",
-                        "catalytic_enzyme": "",
-                        "warning_ec": warning_ec,
-                        "warning_enz": "no_gpr"
-                    })
-                continue
-
-            # Check GPR 
-            for genes_group in gpr_groups:
+                genes_str, uniprot_ids, uniprot_str = gene_group
                 warning_enz = ""
 
-                genes_group = [g.strip() for g in genes_group if g.strip()]
-                uniprot_ids = []
-
-                for gene in genes_group:
-                    try:
-                        uniprot = model.genes.get_by_id(gene).annotation.get("uniprot")
-                        if uniprot:
-                            if isinstance(uniprot, list):
-                                uniprot_ids.extend(uniprot)
-                            else:
-                                uniprot_ids.append(uniprot)
-                    except KeyError:
-                        continue
-
-                uniprot_ids = list(set(uniprot_ids))
-
                 # Identify catalytic enzyme
                 if len(uniprot_ids) > 1:
-                    catalytic_enzyme = identify_catalytic_enzyme(";".join(uniprot_ids), ec)
+                    catalytic_enzyme = identify_catalytic_enzyme(uniprot_str, ec)
                 else:
                     catalytic_enzyme = uniprot_ids[0] if uniprot_ids else ""
 
@@ -241,38 +267,33 @@ def create_kcat_output(model):
                 elif ";" in catalytic_enzyme:
                     warning_enz = "multiple"
 
-                for direction, sn, sk, pn, pk in (
-                    [("forward", subs_names, subs_keggs, prod_names, prod_keggs),
-                     ("reverse", prod_names, prod_keggs, subs_names, subs_keggs)]
-                    if rxn.reversibility else
-                    [("forward", subs_names, subs_keggs, prod_names, prod_keggs)]
-                ):
-                    rows.append({
-                        "rxn": rxn.id,
-                        "rxn_kegg": kegg_rxn_id,
-                        "ec_code": ec,
-                        "direction": direction,
-                        "substrates_name": ";".join(sn),
-                        "substrates_kegg": ";".join(sk),
-                        "products_name": ";".join(pn),
-                        "products_kegg": ";".join(pk),
-                        "genes": ";".join(genes_group),
-                        "uniprot": ";".join(uniprot_ids),
-                        "catalytic_enzyme": catalytic_enzyme,
-                        "warning_ec": warning_ec,
-                        "warning_enz": warning_enz
-                    })
-
-    # Build final df
-    df = pd.DataFrame(rows)
+            rows.append((
+                rxn_id, kegg_rxn_id, ec, "forward", subs_names, subs_keggs, prod_names, prod_keggs,
+                genes_str, uniprot_str, catalytic_enzyme,
+                warning_ec, warning_enz
+            ))
+            reversible.append(rxn.reversibility)
+
+    # Build final df, with the reverse direction of reversible reactions right after their forward row
+    df = pd.DataFrame(rows, columns=KCAT_COLUMNS)
+    df_reverse = df[pd.Series(reversible, dtype=bool)].rename(columns={
+        "substrates_name": "products_name", "products_name": "substrates_name",
+        "substrates_kegg": "products_kegg", "products_kegg": "substrates_kegg",
+    })
+    df_reverse["direction"] = "reverse"
+    df = pd.concat([df, df_reverse[KCAT_COLUMNS]]).sort_index(kind="stable").reset_index(drop=True)
+
+    # The warnings only take a few values, compare them as categories
+    warning_ec = df["warning_ec"].astype("category")
+    warning_enz = df["warning_enz"].astype("category")
 
     report_statistics = {
         "nb_missing_ec": df.loc[df["ec_code"] == "", "rxn"].nunique(),
-        "nb_incomplete_ec": df.loc[df["warning_ec"] == "incomplete", "ec_code"].nunique(),
-        "nb_transferred_ec": df.loc[df["warning_ec"] == "transferred", "ec_code"].nunique(),
-        "nb_missing_gpr": df.loc[df["warning_enz"] == "no_gpr", "rxn"].nunique(),
-        "nb_missing_catalytic_enzyme": (df["warning_enz"] == "none").sum(),
-        "nb_multiple_catalytic_enzymes": (df["warning_enz"] == "multiple").sum()
+        "nb_incomplete_ec": df.loc[warning_ec == "incomplete", "ec_code"].nunique(),
+        "nb_transferred_ec": df.loc[warning_ec == "transferred", "ec_code"].nunique(),
+        "nb_missing_gpr": df.loc[warning_enz == "no_gpr", "rxn"].nunique(),
+        "nb_missing_catalytic_enzyme": (warning_enz == "none").sum(),
+        "nb_multiple_catalytic_enzymes": (warning_enz == "multiple").sum()
     }
 
     # Filtering
@@ -280,14 +301,15 @@ def create_kcat_output(model):
     rxn_before = df['rxn'].nunique() 
 
     # Remove rows without EC and without catalytic enzyme
-    df = df[~((df["ec_code"] == "") & (df["catalytic_enzyme"] == ""))]
-    df = df[~((df["ec_code"] == "") & (df["warning_enz"] == "none"))] 
+    no_ec_no_enzyme = (df["ec_code"] == "") & ((df["catalytic_enzyme"] == "") | (warning_enz == "none"))
 
     # Remove rows with incorrect EC codes (transferred or incomplete) and without catalytic enzyme
-    df = df[~((df["warning_ec"] == "transferred") & (df["warning_enz"] == "none"))]
-    df = df[~((df["warning_ec"] == "transferred") & (df["warning_enz"] == "no_gpr"))]
-    df = df[~((df["warning_ec"] == "incomplete") & (df["warning_enz"] == "none"))]
-    df = df[~((df["warning_ec"] == "incomplete") & (df["warning_enz"] == "no_gpr"))]    
+    incorrect_ec_no_enzyme = (
+        warning_ec.isin(["transferred", "incomplete"]) 
+        & warning_enz.isin(["none", "no_gpr"])
+    )
+
+    df = df[~(no_ec_no_enzyme | incorrect_ec_no_enzyme)]
 
     rows_exchange = len(df) 
     rxn_exchange = df['rxn'].nunique()
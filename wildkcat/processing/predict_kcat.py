@@ -13,6 +13,35 @@ from ..utils.manage_warnings import DedupFilter
 # TODO: Simplify the format of the final output file (remove some columns) 
 
 
+# Columns of the retrieved kcat file used to build the CataPro input
+PREDICTION_INPUT_DTYPES = {
+    "ec_code": str,
+    "substrates_name": str,
+    "substrates_kegg": str,
+    "products_kegg": str,
+    "uniprot": str,
+    "penalty_score": float,
+}
+
+
+# Columns describing the retrieved kcat value, emptied when the predicted value is used
+RETRIEVAL_COLUMNS = [
+    "warning_arr",
+    "penalty_score", "kcat_substrate", "kcat_organism", "kcat_enzyme", 
+    "kcat_temperature", "kcat_ph", "kcat_variant", "kcat_id_percent", "kcat_organism_score"
+]
+
+# Columns of the final kcat file, in order
+FINAL_COLUMNS = [
+    "rxn", "rxn_kegg", "ec_code", "ec_codes", "direction", 
+    "substrates_name", "substrates_kegg", "products_name", "products_kegg", 
+    "genes", "uniprot", "catalytic_enzyme", 
+    "warning_ec", "warning_enz", "warning_arr", 
+    "kcat", "db", 
+    "penalty_score", "kcat_substrate", "kcat_organism", "kcat_enzyme", "kcat_temperature", "kcat_ph", "kcat_variant", "kcat_id_percent", "kcat_organism_score"
+]
+
+
 # --- Format ---
 
 
@@ -27,56 +56,20 @@ def format_output(kcat_df, limit_penalty_score):
     Returns: 
         pandas.DataFrame : Formatted DataFrame with selected and rounded kcat values, reordered columns, and updated source information.
     """
-    kcat_df = kcat_df.rename(columns={"kcat": "kcat_source", "db": "kcat_source_db"})
-
-    def choose_row(row):
-        if pd.notna(row["kcat_source"]):
-            if row["penalty_score"] >= limit_penalty_score and pd.notna(row["catapro_predicted_kcat_s"]):
-                return pd.Series([row["catapro_predicted_kcat_s"], "catapro"])
-            else:
-                return pd.Series([row["kcat_source"], row["kcat_source_db"]])
-        else:
-            if pd.notna(row["catapro_predicted_kcat_s"]):
-                return pd.Series([row["catapro_predicted_kcat_s"], "catapro"])
-            else:
-                return pd.Series([np.nan, np.nan])
-
-    # Add final kcat + db
-    kcat_df[["kcat", "kcat_db"]] = kcat_df.apply(choose_row, axis=1)
-
-    # Round numeric columns
-    kcat_df["kcat"] = kcat_df["kcat"].round(4)
-    kcat_df["kcat_source"] = kcat_df["kcat_source"].round(4)
-    kcat_df["kcat_id_percent"] = kcat_df["kcat_id_percent"].round(2)
-    kcat_df["catapro_predicted_kcat_s"] = kcat_df["catapro_predicted_kcat_s"].round(1)
-
-    # Drop useless columns
-    kcat_df = kcat_df.drop(columns=["kcat_source", "catapro_predicted_kcat_s", "kcat_source_db"])
-
-    # Rename columns 
-
-    kcat_df = kcat_df.rename(columns={
-        "kcat_db": "db"
-    })
-
-    # If db = catapro then remove the content in the columns "penalty_score", "kcat_substrate", "kcat_organism", "kcat_enzyme", "kcat_temperature", "kcat_ph", "kcat_variant", "kcat_id_percent"
-    kcat_df.loc[kcat_df['db'] == 'catapro', [
-        "warning_arr",
-        "penalty_score", "kcat_substrate", "kcat_organism", "kcat_enzyme", 
-        "kcat_temperature", "kcat_ph", "kcat_variant", "kcat_id_percent", "kcat_organism_score"
-        ]] = np.nan
-    
-    # Reorder columns
-    kcat_df = kcat_df[[
-        "rxn", "rxn_kegg", "ec_code", "ec_codes", "direction", 
-        "substrates_name", "substrates_kegg", "products_name", "products_kegg", 
-        "genes", "uniprot", "catalytic_enzyme", 
-        "warning_ec", "warning_enz", "warning_arr", 
-        "kcat", "db", 
-        "penalty_score", "kcat_substrate", "kcat_organism", "kcat_enzyme", "kcat_temperature", "kcat_ph", "kcat_variant", "kcat_id_percent", "kcat_organism_score"
-        ]]
+    # Final kcat + db: the prediction is used when there is no retrieved value or its penalty is above the limit
+    use_catapro = kcat_df["catapro_predicted_kcat_s"].notna() & (
+        kcat_df["kcat"].isna() | (kcat_df["penalty_score"] >= limit_penalty_score)
+    )
+    kcat_df = kcat_df.assign(
+        kcat=kcat_df["catapro_predicted_kcat_s"].where(use_catapro, kcat_df["kcat"]),
+        db=kcat_df["db"].where(kcat_df["kcat"].notna()).mask(use_catapro, "catapro"),
+    ).round({"kcat": 4, "kcat_id_percent": 2})
+
+    # If db = catapro then remove the content of the columns describing the retrieved value
+    kcat_df.loc[use_catapro, RETRIEVAL_COLUMNS] = np.nan
 
-    return kcat_df
+    # Reorder columns
+    return kcat_df[FINAL_COLUMNS]
 
 
 # --- Main ---
@@ -110,7 +103,7 @@ def run_prediction_part1(output_folder: str,
     if not os.path.isfile(kcat_file_path):
         raise FileNotFoundError(f"The specified file '{kcat_file_path}' does not exist in the output folder. Please run the function 'run_retrieval()' first.")
 
-    kcat_df = pd.read_csv(kcat_file_path, sep='\t')
+    kcat_df = pd.read_csv(kcat_file_path, sep='\t', usecols=list(PREDICTION_INPUT_DTYPES), dtype=PREDICTION_INPUT_DTYPES)
 
     # Subset rows with no values or matching score above the limit
     kcat_df = kcat_df[(kcat_df['penalty_score'] >= limit_penalty_score) | (kcat_df['penalty_score'].isnull())]
@@ -119,26 +112,31 @@ def run_prediction_part1(output_folder: str,
     kcat_df = kcat_df[kcat_df['uniprot'].notnull() & kcat_df['substrates_kegg'].notnull()]
     nb_missing_enzymes = before_duplicates_filter - len(kcat_df) + 1 
     
+    # Reuse the SMILES resolved by a previous run, if any
+    output_path = os.path.join(output_folder, "machine_learning/catapro_input.csv")
+    substrates_to_smiles_path = output_path.replace('.csv', '_substrates_to_smiles.tsv')
+    known_smiles = None
+    if os.path.isfile(substrates_to_smiles_path):
+        known_smiles_df = pd.read_csv(substrates_to_smiles_path, sep='\t', dtype=str).dropna()
+        known_smiles = dict(zip(known_smiles_df['kegg_id'], known_smiles_df['smiles']))
+
     # Generate CataPro input file
-    catapro_input_df, substrates_to_smiles_df, report_statistics = create_catapro_input_file(kcat_df)
+    catapro_input_df, substrates_to_smiles_df, report_statistics = create_catapro_input_file(kcat_df, known_smiles)
 
     # Save the CataPro input file and substrates to SMILES mapping
     os.makedirs(os.path.join(output_folder, "machine_learning"), exist_ok=True)
-    output_path = os.path.join(output_folder, "machine_learning/catapro_input.csv")
-    kcat_df.to_csv(output_path, sep='\t', index=False)
     catapro_input_df.to_csv(output_path, sep=',', index=True)
-    substrates_to_smiles_df.to_csv(output_path.replace('.csv', '_substrates_to_smiles.tsv'), sep='\t', index=False)
+    substrates_to_smiles_df.to_csv(substrates_to_smiles_path, sep='\t', index=False)
     logging.info(f"Output saved to '{output_path}'")
 
     # Add statistics 
     report_statistics["missing_enzymes"] = nb_missing_enzymes
 
-    nb_predicted_transport = 0
-    for _, row in kcat_df.iterrows():         
-        if row['substrates_kegg'] == row['products_kegg'] and row['penalty_score'] >= limit_penalty_score: 
-            nb_predicted_transport += 1
-    
-    report_statistics['predicted_transport'] = nb_predicted_transport
+    is_predicted_transport = (
+        (kcat_df['substrates_kegg'] == kcat_df['products_kegg']) 
+        & (kcat_df['penalty_score'] >= limit_penalty_score)
+    )
+    report_statistics['predicted_transport'] = int(is_predicted_transport.sum())
 
     if report:
         report_prediction_input(catapro_input_df, report_statistics, output_folder)
@@ -171,8 +169,10 @@ def run_prediction_part2(output_folder: str,
         raise FileNotFoundError(f"The specified file '{kcat_file_path}' does not exist in the output folder. Please run the function 'run_extraction()' first.")
     kcat_df = pd.read_csv(kcat_file_path, sep='\t')
     substrates_to_smiles_path = os.path.join(output_folder, "machine_learning/catapro_input_substrates_to_smiles.tsv")
-    substrates_to_smiles = pd.read_csv(substrates_to_smiles_path, sep='\t')
-    catapro_predictions_df = pd.read_csv(catapro_predictions_path, sep=',')
+    substrates_to_smiles = pd.read_csv(substrates_to_smiles_path, sep='\t', dtype=str)
+    catapro_predictions_df = pd.read_csv(catapro_predictions_path, sep=',', 
+                                         usecols=['fasta_id', 'smiles', 'pred_log10[kcat(s^-1)]'],
+                                         dtype={'fasta_id': str, 'smiles': str, 'pred_log10[kcat(s^-1)]': float})
     kcat_df = integrate_catapro_predictions(kcat_df, 
                                             substrates_to_smiles,
                                             catapro_predictions_df
@@ -182,9 +182,9 @@ def run_prediction_part2(output_folder: str,
     kcat_df = format_output(kcat_df, limit_penalty_score)
 
     # Add warning for the predicted transport reactions in the log file
-    for _, row in kcat_df.iterrows():         
-        if row['substrates_kegg'] == row['products_kegg'] and row['db'] == 'catapro': 
-            logging.warning(f"kcat for transport reaction: '{row['rxn']}' was ML-predicted. Transport reaction predictions are less reliable due to sparse training data")
+    is_predicted_transport = (kcat_df['substrates_kegg'] == kcat_df['products_kegg']) & (kcat_df['db'] == 'catapro')
+    for rxn in kcat_df.loc[is_predicted_transport, 'rxn'].tolist():
+        logging.warning(f"kcat for transport reaction: '{rxn}' was ML-predicted. Transport reaction predictions are less reliable due to sparse training data")
     
     output_path = os.path.join(output_folder, "kcat_full.tsv")
     kcat_df.to_csv(output_path, sep='\t', index=False)
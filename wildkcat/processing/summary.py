@@ -7,6 +7,10 @@ from ..processing.extract_kcat import read_model
 from ..utils.generate_reports import report_final
 
 
+# Columns used by the summary report
+SUMMARY_COLUMNS = ["rxn", "kcat", "db"]
+
+
 def generate_summary_report(model_path: str,
                             output_folder: str) -> None:
     """
@@ -23,13 +27,13 @@ def generate_summary_report(model_path: str,
     kcat_full_file_path = os.path.join(output_folder, "kcat_full.tsv")
     kcat_retrieve_file_path = os.path.join(output_folder, "kcat_retrieved.tsv")
     if os.path.isfile(kcat_full_file_path):
-        kcat_df = pd.read_csv(kcat_full_file_path, sep='\t')
+        kcat_df = pd.read_csv(kcat_full_file_path, sep='\t', usecols=SUMMARY_COLUMNS)
         model = read_model(model_path)
         report_final(model, kcat_df, output_folder)
     elif os.path.isfile(kcat_retrieve_file_path):
         logging.warning(f"The file 'kcat_full.tsv' is not present in the folder '{output_folder}' the general report will be done without predicted values.")
         model = read_model(model_path)
-        kcat_df = pd.read_csv(kcat_retrieve_file_path, sep='\t')
+        kcat_df = pd.read_csv(kcat_retrieve_file_path, sep='\t', usecols=SUMMARY_COLUMNS)
         report_final(model, kcat_df, output_folder)
     else: 
         raise FileNotFoundError(f"The specified folder '{output_folder}' does not contain the files: 'kcat_full.tsv', 'kcat_retrieve.tsv'. Please run at least the extraction step.")
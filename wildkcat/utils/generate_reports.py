@@ -1,14 +1,11 @@
 import os
-import io
 import base64
 import logging
 import datetime
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import plotly.express as px
-from matplotlib.ticker import LogFormatter, MaxNLocator
 from io import BytesIO
+# plotly and matplotlib are imported inside the report functions, only when a report is generated
 
 
 def report_extraction(model, df, report_statistics, output_folder, shader=False) -> None:
@@ -25,26 +22,19 @@ def report_extraction(model, df, report_statistics, output_folder, shader=False)
     Returns: 
         None: The function saves the generated HTML report to 'reports/extract_kcat_report.html'. 
     """
+    import plotly.express as px
+
     # Model statistics
     nb_model_reactions = len(model.reactions)
     nb_model_metabolites = len(model.metabolites)
     nb_model_genes = len(model.genes)
-    rxn_with_ec = 0
-    unique_ec_codes = []
-
-    for rxn in model.reactions:
-        ec_code = rxn.annotation.get('ec-code')
-        if ec_code:
-            rxn_with_ec += 1
-            if isinstance(ec_code, str):
-                ec_code = [ec_code.strip()]
-            elif isinstance(ec_code, list):
-                ec_code = [x.strip() for x in ec_code if x.strip()]
-            else:
-                ec_code = []
-            unique_ec_codes.extend(ec_code)
-    
-    nb_model_ec_codes = len(set(unique_ec_codes))
+    ec_annotations = [ec_code for ec_code in (rxn.annotation.get('ec-code') for rxn in model.reactions) if ec_code]
+    rxn_with_ec = len(ec_annotations)
+    nb_model_ec_codes = len({
+        x.strip()
+        for ec_code in ec_annotations if isinstance(ec_code, (str, list))
+        for x in ([ec_code] if isinstance(ec_code, str) else ec_code) if x.strip()
+    })
 
     # Kcat statistics
     nb_reactions = df['rxn'].nunique()
@@ -89,7 +79,7 @@ def report_extraction(model, df, report_statistics, output_folder, shader=False)
     pie_chart_html = fig.to_html(full_html=False, include_plotlyjs="cdn")
 
     # Time
-    generated_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    generated_time = report_timestamp()
 
     # Html report
     html = f"""
@@ -229,20 +219,9 @@ def report_extraction(model, df, report_statistics, output_folder, shader=False)
 
         <footer>WILDkCAT</footer>
     """
-    if shader:
-        html += report_shader()
-    else: 
-        html += report_simple()
-    html += """
-    </body>
-    </html>
-    """
 
     # Save report
-    os.makedirs(os.path.join(output_folder, "reports"), exist_ok=True)
-    report_path = os.path.join(output_folder, "reports/extract_report.html")
-    with open(report_path, "w", encoding="utf-8") as f:
-        f.write(html)
+    report_path = write_report(output_folder, "reports/extract_report.html", html, shader)
     logging.info(f"HTML report saved to '{report_path}'")
 
 
@@ -259,8 +238,12 @@ def report_retrieval(df, output_folder, parameters, shader=False) -> None:
     Returns:
         None: The function saves the generated HTML report to 'reports/retrieve_kcat_report.html'.
     """
+    from matplotlib.figure import Figure
+    from matplotlib.ticker import LogFormatter, MaxNLocator
+
     # Ensure numeric kcat values to avoid TypeError on comparisons
-    kcat_values = pd.to_numeric(df['kcat'], errors='coerce').dropna()
+    kcat_values = df['kcat'] if pd.api.types.is_numeric_dtype(df['kcat']) else pd.to_numeric(df['kcat'], errors='coerce')
+    kcat_values = kcat_values.dropna()
 
     # Only use scores present in the data
     present_scores = sorted(df['penalty_score'].dropna().unique())
@@ -293,11 +276,9 @@ def report_retrieval(df, output_folder, parameters, shader=False) -> None:
         "#7b241c"
     ]
 
-    def score_color(score):
-        idx = present_scores.index(score)
-        return distinct_colors[idx % len(distinct_colors)]
+    score_colors = {score: distinct_colors[i % len(distinct_colors)] for i, score in enumerate(present_scores)}
 
-    generated_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    generated_time = report_timestamp()
     
     # Parameters
     temp = parameters.get('Temperature')
@@ -308,26 +289,24 @@ def report_retrieval(df, output_folder, parameters, shader=False) -> None:
 
     # Histogram with stacked bars for scores
     kcat_hist_base64 = ""
-    if not kcat_values.empty:
-        min_exp = int(np.floor(np.log10(max(1e-6, kcat_values.min()))))
-        max_exp = int(np.ceil(np.log10(kcat_values.max())))
+    positive_kcat = kcat_values.to_numpy(dtype=np.float64)
+    positive_kcat = positive_kcat[positive_kcat > 0]  # Only positive values can be placed on a log scale
+    if positive_kcat.size:
+        min_exp = int(np.floor(np.log10(positive_kcat.min())))
+        max_exp = int(np.ceil(np.log10(positive_kcat.max())))
         bins = np.logspace(min_exp, max_exp, num=40)
 
         # Rm empty score groups (15 - 16)
-        hist_data = []
-        valid_scores = []
-        for score in present_scores:
-            vals = pd.to_numeric(df[df['penalty_score'] == score]['kcat'], errors='coerce')
-            vals = vals[vals.notna()]
-            if not vals.empty:
-                hist_data.append(vals)
-                valid_scores.append(score)
-
-        fig, ax = plt.subplots(figsize=(12, 6))
+        kcat_by_score = dict(tuple(kcat_values.groupby(df.loc[kcat_values.index, 'penalty_score'])))
+        valid_scores = [score for score in present_scores if score in kcat_by_score]
+        hist_data = [kcat_by_score[score] for score in valid_scores]
+
+        fig = Figure(figsize=(12, 6))
+        ax = fig.subplots()
         
         # Stacked histogram by score
         ax.hist(hist_data, bins=bins, stacked=True, 
-                color=[score_color(s) for s in valid_scores],
+                color=[score_colors[s] for s in valid_scores],
                 label=[f"{s}" for s in valid_scores],
                 edgecolor='white')
         
@@ -358,11 +337,8 @@ def report_retrieval(df, output_folder, parameters, shader=False) -> None:
         ax.grid(True, which='major', axis='y', linestyle='--', linewidth=0.6, alpha=0.4)
         ax.grid(False, which='major', axis='x') 
 
-        plt.tight_layout(rect=[0, 0, 0.85, 1])
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', bbox_inches='tight')
-        plt.close(fig)
-        kcat_hist_base64 = base64.b64encode(buf.getvalue()).decode('utf-8')
+        fig.tight_layout(rect=[0, 0, 0.85, 1])
+        kcat_hist_base64 = fig_to_base64(fig)
 
     # HTML start
     html = f"""
@@ -428,10 +404,10 @@ def report_retrieval(df, output_folder, parameters, shader=False) -> None:
     """
 
     # Add progress bars only for present scores
-    for score in present_scores:
-        percent = score_percent.get(score, 0)
-        if percent > 0:
-            html += f'<div class="progress-bar" style="width:{percent}%;background:{score_color(score)};" title="Score {score}: {percent:.2f}%"></div>'
+    html += "".join(
+        f'<div class="progress-bar" style="width:{score_percent[score]}%;background:{score_colors[score]};" title="Score {score}: {score_percent[score]:.2f}%"></div>'
+        for score in present_scores if score_percent.get(score, 0) > 0
+    )
 
     html += """
             </div>
@@ -439,8 +415,10 @@ def report_retrieval(df, output_folder, parameters, shader=False) -> None:
     """
 
     # Add legend only for present scores
-    for score in present_scores:
-        html += f'<div class="legend-item"><div class="legend-color" style="background:{score_color(score)};"></div> Score {score}</div>'
+    html += "".join(
+        f'<div class="legend-item"><div class="legend-color" style="background:{score_colors[score]};"></div> Score {score}</div>'
+        for score in present_scores
+    )
 
     html += """
             </div>
@@ -453,8 +431,10 @@ def report_retrieval(df, output_folder, parameters, shader=False) -> None:
     """
 
     # Table rows only for present scores
-    for score in present_scores:
-        html += f'<tr><td>{score}</td><td>{score_counts[score]}</td><td>{score_percent[score]:.2f}%</td></tr>'
+    html += "".join(
+        f'<tr><td>{score}</td><td>{score_counts[score]}</td><td>{score_percent[score]:.2f}%</td></tr>'
+        for score in present_scores
+    )
 
     html += """
             </table>
@@ -560,20 +540,9 @@ def report_retrieval(df, output_folder, parameters, shader=False) -> None:
 
         <footer>WILDkCAT</footer>
     """
-    if shader: 
-        html += report_shader()
-    else: 
-        html += report_simple()
-    html += """
-    </body>
-    </html>
-    """
 
     # Save HTML
-    os.makedirs(os.path.join(output_folder, "reports"), exist_ok=True)
-    report_path = os.path.join(output_folder, "reports/retrieve_report.html")
-    with open(report_path, "w", encoding="utf-8") as f:
-        f.write(html)
+    report_path = write_report(output_folder, "reports/retrieve_report.html", html, shader)
 
     logging.info(f"HTML report saved to '{report_path}'")
 
@@ -607,7 +576,7 @@ def report_prediction_input(catapro_df, report_statistics, output_folder, shader
     rxn_coverage = (rxn_covered / total_rxn * 100) if total_rxn > 0 else 0
 
     # Time
-    generated_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    generated_time = report_timestamp()
 
     # Html report
     html = f"""
@@ -736,20 +705,9 @@ def report_prediction_input(catapro_df, report_statistics, output_folder, shader
 
     <footer>WILDkCAT</footer>
     """
-    if shader:
-        html += report_shader()
-    else: 
-        html += report_simple()
-    html += """
-    </body>
-    </html>
-    """
 
     # Save report
-    os.makedirs(os.path.join(output_folder, "reports"), exist_ok=True)
-    report_path = os.path.join(output_folder, "reports/predict_report.html")
-    with open(report_path, "w", encoding="utf-8") as f:
-        f.write(html)
+    report_path = write_report(output_folder, "reports/predict_report.html", html, shader)
     logging.info(f"HTML report saved to '{report_path}'")
 
 
@@ -764,47 +722,40 @@ def report_final(model, final_df, output_folder, shader=False) -> None:
     Returns: 
         None: The function saves the generated HTML report to 'reports/general_report.html'.
     """
+    from matplotlib.figure import Figure
+    from matplotlib.ticker import LogFormatter, MaxNLocator
+
     # Model information 
     nb_model_reactions = len(model.reactions)
     nb_model_metabolites = len(model.metabolites)
     nb_model_genes = len(model.genes)
 
 
-    df = final_df.copy()
-    df["db"] = df["db"].fillna("Unknown")
-    generated_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    # Utility to convert matplotlib figures to base64 <img>
-    def fig_to_base64(fig):
-        buf = BytesIO()
-        fig.savefig(buf, format="png", bbox_inches="tight")
-        buf.seek(0)
-        encoded = base64.b64encode(buf.read()).decode("utf-8")
-        plt.close(fig)
-        return f'<div class="plot-container"><img src="data:image/png;base64,{encoded}"></div>'
+    kcat = final_df["kcat"] if pd.api.types.is_numeric_dtype(final_df["kcat"]) else pd.to_numeric(final_df["kcat"], errors='coerce')
+    generated_time = report_timestamp()
 
     # Distribution plots
-    def plot_kcat_distribution_stacked(column_name, title, source):
-        # Ensure numeric kcat
-        df[column_name] = pd.to_numeric(df[column_name], errors='coerce')
-
-        # Drop NaNs for both columns
-        valid_df = df.dropna(subset=[column_name, source])
-        kcat_values = valid_df[column_name]
+    def plot_kcat_distribution_stacked(kcat, title, source):
+        # Drop NaNs
+        vals = kcat.to_numpy(dtype=np.float64)
+        valid = ~np.isnan(vals)
+        kcat_values = vals[valid]
 
-        total = len(df)
+        total = len(vals)
         matched = len(kcat_values)
         match_percent = matched / total * 100 if total else 0
 
-        if not kcat_values.empty:
+        positive_kcat = kcat_values[kcat_values > 0]  # Only positive values can be placed on a log scale
+        if positive_kcat.size:
             # Define log bins
-            min_exp = int(np.floor(np.log10(max(1e-6, kcat_values.min()))))
-            max_exp = int(np.ceil(np.log10(kcat_values.max())))
+            min_exp = int(np.floor(np.log10(positive_kcat.min())))
+            max_exp = int(np.ceil(np.log10(positive_kcat.max())))
             bins = np.logspace(min_exp, max_exp, num=40)
 
-            # Prepare data for stacked histogram
-            sources = valid_df[source].unique()
-            grouped_values = [valid_df.loc[valid_df[source] == src, column_name] for src in sources]
+            # Prepare data for stacked histogram (sources in order of appearance)
+            codes, sources = pd.factorize(source[valid], use_na_sentinel=False)
+            sources = ["Unknown" if pd.isna(src) else src for src in sources]
+            grouped_values = [kcat_values[codes == i] for i in range(len(sources))]
 
             # Fixed color mapping
             color_map = {
@@ -821,11 +772,11 @@ def report_final(model, final_df, output_folder, shader=False) -> None:
                 "Unknown": "Unknown"
             }
 
-            sources = [src for src in sources if src in valid_df[source].unique()]
             colors = [color_map.get(src, "#999999") for src in sources]
 
             # Plot
-            fig, ax = plt.subplots(figsize=(12, 6))
+            fig = Figure(figsize=(12, 6))
+            ax = fig.subplots()
             ax.hist(grouped_values, bins=bins, stacked=True,
                     color=colors, label=[label_map[s] for s in sources],
                     edgecolor="white", linewidth=0.7)
@@ -857,17 +808,18 @@ def report_final(model, final_df, output_folder, shader=False) -> None:
             ax.grid(True, which='major', axis='y', linestyle='--', linewidth=0.6, alpha=0.4)
             ax.grid(False, which='major', axis='x') 
             
-            plt.tight_layout(rect=[0, 0, 0.85, 1])
+            fig.tight_layout(rect=[0, 0, 0.85, 1])
 
-            return fig_to_base64(fig)
+            return f'<div class="plot-container"><img src="data:image/png;base64,{fig_to_base64(fig)}"></div>'
 
         return "<p>No valid values available for plotting.</p>"
     
     img_final = plot_kcat_distribution_stacked(
-        'kcat', rf"{model.id} - $k_{{\mathrm{{cat}}}}$ Distribution", "db"
+        kcat, rf"{model.id} - $k_{{\mathrm{{cat}}}}$ Distribution", final_df["db"]
     )
     
-    db_counts = df["db"].fillna("Unknown").value_counts()
+    db_counts = final_df["db"].value_counts(dropna=False)
+    db_counts.index = db_counts.index.fillna("Unknown")
     total_db = db_counts.sum()
 
     # Couleurs
@@ -881,8 +833,8 @@ def report_final(model, final_df, output_folder, shader=False) -> None:
     # Ordre imposé
     ordered_dbs = ["brenda", "sabio_rk", "catapro", "Unknown"]
 
-    progress_segments = ""
-    legend_items = ""
+    segment_parts = []
+    legend_parts = []
 
     for db in ordered_dbs:
         count = db_counts.get(db, 0)
@@ -893,18 +845,21 @@ def report_final(model, final_df, output_folder, shader=False) -> None:
 
         color = colors.get(db, "#ddd")
 
-        progress_segments += f"""
+        segment_parts.append(f"""
             <div class="progress-segment" style="width:{percent:.1f}%; background-color:{color};"
                 title="{db.capitalize()}: {percent:.1f}%"></div>
-        """
+        """)
 
-        legend_items += f"""
+        legend_parts.append(f"""
             <span style="display:flex; align-items:center; margin-right:15px; margin-bottom:5px;">
                 <span style="display:flex; align-items:center; width:16px; height:16px; 
                             background:{color}; border:1px solid #000; margin-right:5px;"></span>
                 {db.capitalize()} ({percent:.1f}%)
             </span>
-        """
+        """)
+
+    progress_segments = "".join(segment_parts)
+    legend_items = "".join(legend_parts)
 
     progress_bar = f"""
         <div class="progress-multi" style="height: 18px; margin-bottom:18px; display:flex;">
@@ -916,15 +871,15 @@ def report_final(model, final_df, output_folder, shader=False) -> None:
     """
 
     # Statistics 
-    grouped = df.groupby("rxn")
-    rxns_with_kcat = grouped["kcat"].apply(lambda x: x.notna().any())
-    nb_reactions = df['rxn'].nunique()
+    rxns = final_df["rxn"].astype("category")  # Hash the reaction ids once
+    rxns_with_kcat = kcat.notna().groupby(rxns, observed=True).any()
+    nb_reactions = len(rxns.cat.categories)
     nb_rxn_with_kcat = rxns_with_kcat.sum()
     coverage = nb_rxn_with_kcat / nb_reactions
     coverage_total = nb_rxn_with_kcat / nb_model_reactions
 
-    kcat_values = df["kcat"].dropna()
-    total = len(df)
+    kcat_values = kcat.dropna()
+    total = len(final_df)
     matched = len(kcat_values)
     match_percent = matched / total
 
@@ -1037,31 +992,68 @@ def report_final(model, final_df, output_folder, shader=False) -> None:
             <div class="card">
                 <h2>k<sub>cat</sub> Distribution</h2>
                 <div class="img-section">
-                    {img_final}
+                    """
+
+    # The base64 plot goes to the file as its own part, without being copied into the page string
+    html_end = """
                 </div>
             </div>
         </div>
 
         <footer>WILDkCAT</footer>
     """
-    if shader:
-        html += report_shader()
-    else: 
-        html += report_simple()
-    html += """
-    </body>
-    </html>
-    """
 
-    os.makedirs(os.path.join(output_folder, "reports"), exist_ok=True)
-    report_path = os.path.join(output_folder, "reports/general_report.html")
-    with open(report_path, "w", encoding="utf-8") as f:
-        f.write(html)
+    report_path = write_report(output_folder, "reports/general_report.html", [html, img_final, html_end], shader)
 
     logging.info(f"HTML report saved to '{report_path}'")
     return report_path
 
 
+def fig_to_base64(fig) -> str:
+    """
+    Encode a matplotlib figure as a base64 PNG, to be embedded in a report.
+
+    Parameters:
+        fig (matplotlib.figure.Figure): The figure to encode.
+
+    Returns:
+        str: The base64-encoded PNG image.
+    """
+    buf = BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight", pil_kwargs={"compress_level": 1})
+    return base64.b64encode(buf.getbuffer()).decode("ascii")
+
+
+def write_report(output_folder, report_name, html, shader=False) -> str:
+    """
+    Write an HTML report section by section, closing the document with the selected background.
+
+    Parameters:
+        output_folder (str): Output folder containing the 'reports' directory.
+        report_name (str): Path of the report relative to the output folder.
+        html (str or list[str]): Report body up to and including the footer, or its successive parts.
+        shader (bool): Whether to use the shader background instead of the simple one.
+
+    Returns:
+        str: Path of the written report.
+    """
+    os.makedirs(os.path.join(output_folder, "reports"), exist_ok=True)
+    report_path = os.path.join(output_folder, report_name)
+    with open(report_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.writelines([html] if isinstance(html, str) else html)
+        f.write(report_shader() if shader else report_simple())
+        f.write("""
+    </body>
+    </html>
+    """)
+    return report_path
+
+
+def report_timestamp() -> str:
+    """Return the generation time shown in the report header, to the second."""
+    return datetime.datetime.now().isoformat(sep=" ", timespec="seconds")
+
+
 def report_style():
     """Return CSS script for report style."""
     return """
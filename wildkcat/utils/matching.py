@@ -2,6 +2,7 @@ import re
 import logging
 import pandas as pd 
 import numpy as np
+from functools import lru_cache
 from typing import Optional, Tuple, Dict, Any
 
 from ..utils.temperature import arrhenius_equation, calculate_ea
@@ -91,7 +92,7 @@ def find_best_match(kcat_dict, api_output, general_criteria) -> Tuple[float, Opt
     # 4. Tie-breaking
     if len(tied) > 1:
         # Tie-break with enzyme identity
-        tied = closest_enz(kcat_dict, tied)
+        tied = closest_enz(kcat_dict, tied, best_only=True)
         if not tied['id_perc'].isna().all():
             max_id = tied['id_perc'].max()
             tied = tied[tied['id_perc'] == max_id]
@@ -137,31 +138,39 @@ def find_best_match(kcat_dict, api_output, general_criteria) -> Tuple[float, Opt
 
 # --- Utils --- 
 
+_STEREO_PREFIX_PATTERN = re.compile(r'\b[dl]\s*-\s*')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=None)
 def _norm_name(s: str) -> str:
     """Normalize substrates names"""
     if s is None:
         return ""
     s = s.strip().lower()
     # Remove prefixes (d-, l-, d -, l -)
-    s = re.sub(r'\b[dl]\s*-\s*', '', s)
+    s = _STEREO_PREFIX_PATTERN.sub('', s)
     # unify hyphens/spaces
     s = s.replace('-', ' ')
     # compress spaces
-    s = re.sub(r'\s+', ' ', s)
+    s = _WHITESPACE_PATTERN.sub(' ', s)
     return s
 
-def _to_set(x) -> set:
-    """Transform a string 'a; b; c' into a normalized set."""
+@lru_cache(maxsize=None)
+def _split_names(x: str) -> frozenset:
+    """Transform a string 'a; b; c' into a normalized frozenset (cached, the same strings are compared many times)."""
+    return frozenset(_norm_name(p) for p in (t.strip() for t in x.split(';')) if p)
+
+def _to_set(x) -> frozenset:
+    """Transform a string 'a; b; c' into a normalized frozenset (shared with the cache, must not be modified)."""
     if x is None or (isinstance(x, float) and pd.isna(x)):
-        return set()
+        return frozenset()
     if isinstance(x, str):
-        parts = [p for p in (t.strip() for t in x.split(';')) if p]
-    else:
-        parts = list(x)
-    return { _norm_name(p) for p in parts if p }
+        return _split_names(x)
+    return frozenset(_norm_name(p) for p in x if p)
 
 def _any_intersection(a, b) -> bool:
-    return len(_to_set(a) & _to_set(b)) > 0
+    return not _to_set(a).isdisjoint(_to_set(b))
 
 
 # --- Check parameters ---
@@ -2,19 +2,30 @@ import os
 import time
 import socket
 import logging
+import numpy as np
 import pandas as pd
+from collections import Counter
 from Bio import Align, Entrez
 from dotenv import load_dotenv
 from functools import lru_cache
 from urllib.error import HTTPError, URLError
 
-from ..api.uniprot_api import convert_uniprot_to_sequence   
+from ..api.uniprot_api import convert_uniprot_to_sequence, convert_uniprots_to_sequences   
 
 
 load_dotenv()
 
 
-def closest_enz(kcat_dict, api_output) -> pd.DataFrame:
+ALIGNER = Align.PairwiseAligner()  # Shared by all the closest_enz calls
+
+
+@lru_cache(maxsize=None)
+def _residue_counts(sequence):
+    """Count and cache the residues of a sequence, used to bound its identity with another sequence."""
+    return Counter(sequence)
+
+
+def closest_enz(kcat_dict, api_output, best_only=False) -> pd.DataFrame:
     """
     Retrieve and ranks the enzymes sequences closest to the sequence of the target enzyme based on the percentage of identity.
     If the reference UniProt ID is missing, invalid, or the sequence cannot be retrieved, the function returns the input DataFrame with "id_perc" set to None.
@@ -22,26 +33,13 @@ def closest_enz(kcat_dict, api_output) -> pd.DataFrame:
     Parameters:    
         kcat_dict (dict): Dictionary containing at least the key 'uniprot_model' with the reference UniProt ID.
         api_output (pd.DataFrame): DataFrame containing a column "UniProtKB_AC" with UniProt IDs to compare against.
+        best_only (bool, optional): If True, only the candidates that can reach the highest identity are aligned, 
+            the "id_perc" of the others is set to None (default: False).
     
     Returns:
         pd.DataFrame: A copy of `api_output` with an added "id_perc" column (identity percentage). 
     """
 
-    def _calculate_identity(seq_ref, seq_db):
-        """
-        Returns the percentage of identical characters between two sequences.
-        Adapted from https://gist.github.com/JoaoRodrigues/8c2f7d2fc5ae38fc9cb2 
-
-        Parameters: 
-            seq_ref (str): The reference sequence.
-            seq_db (str): The sequence to compare against.
-
-        Returns: 
-            float: The percentage of identical characters between the two sequences.
-        """
-        matches = [a == b for a, b in zip(seq_ref, seq_db)]
-        return (100 * sum(matches)) / len(seq_ref)
-
     ref_uniprot_id = kcat_dict.get('catalytic_enzyme')
     if pd.isna(ref_uniprot_id) or (";" in str(ref_uniprot_id)):
         api_output = api_output.copy()
@@ -54,30 +52,40 @@ def closest_enz(kcat_dict, api_output) -> pd.DataFrame:
         api_output["id_perc"] = None
         return api_output
 
-    aligner = Align.PairwiseAligner()
-    identity_scores = []
-    
-    for uniprot_id in api_output["UniProtKB_AC"]:
-        if pd.isna(uniprot_id):
-            identity_scores.append(None)
-            continue
-        seq = convert_uniprot_to_sequence(uniprot_id)
-        if seq is None:
-            identity_scores.append(None)
-            continue
-        elif len(seq) == 0:
-            identity_scores.append(0)
-            continue
+    # Retrieve the candidate sequences by batches, each unique ID once
+    sequences = convert_uniprots_to_sequences(api_output["UniProtKB_AC"].dropna(), desc=None)
 
-        alignments = aligner.align(ref_seq, seq)
-        aligned_ref, aligned_db = alignments[0]
-        id_score = _calculate_identity(aligned_ref, aligned_db)
-        identity_scores.append(id_score)
+    # Upper bound of the identity: residues shared by both sequences over the shortest possible alignment
+    ref_counts = _residue_counts(ref_seq)
+    max_identity = {
+        uniprot_id: (100 * sum((ref_counts & _residue_counts(seq)).values())) / max(len(ref_seq), len(seq))
+        for uniprot_id, seq in sequences.items() if seq
+    }
 
-    api_output = api_output.copy()
-    api_output["id_perc"] = identity_scores
+    # Align the most promising candidates first, each unique ID once
+    identities = {}
+    best_identity = -1
+    for uniprot_id in sorted(max_identity, key=max_identity.get, reverse=True):
+        if best_only and max_identity[uniprot_id] < best_identity:
+            break  # No remaining candidate can reach the best identity
+        if sequences[uniprot_id] == ref_seq:
+            identities[uniprot_id] = 100.0  # Identical sequences align without gaps
+        else:
+            alignment = ALIGNER.align(ref_seq, sequences[uniprot_id])[0]
+            identities[uniprot_id] = (100 * alignment.counts().identities) / alignment.length
+        best_identity = max(best_identity, identities[uniprot_id])
+
+    # NaN when the sequence is missing or the candidate was not aligned
+    identity_scores = np.full(len(api_output), np.nan)
+    for i, uniprot_id in enumerate(api_output["UniProtKB_AC"].to_numpy()):
+        if pd.isna(uniprot_id) or sequences[uniprot_id] is None:
+            continue
+        elif len(sequences[uniprot_id]) == 0:
+            identity_scores[i] = 0
+        else:
+            identity_scores[i] = identities.get(uniprot_id, np.nan)
 
-    return api_output
+    return api_output.assign(id_perc=identity_scores)
 
 
 Entrez.email = os.getenv("ENTREZ_EMAIL")
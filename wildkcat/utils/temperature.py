@@ -2,6 +2,26 @@ import pandas as pd
 import numpy as np
 
 
+R = 8.314  # Gas constant in J/(mol*K)
+
+
+def calculate_kcat(temp_obj, ea, kcat_ref, temp_ref): 
+    """
+    Calculates the catalytic rate constant (kcat) at a given temperature using the Arrhenius equation.
+
+    Parameters: 
+        temp_obj (float): The target temperature (in Kelvin) at which to calculate kcat.
+        ea (float): The activation energy calculated using calculate_ea(). 
+        kcat_ref (float): The reference kcat value measured at temp_ref.
+        temp_ref (float): The reference temperature (in Kelvin) at which kcat_ref was measured.
+
+    Returns: 
+        float: The calculated kcat value at temp_obj.
+    """
+    kcat_obj = kcat_ref * np.exp(ea / R * (1/temp_ref - 1/temp_obj))
+    return kcat_obj
+
+
 def arrhenius_equation(candidate, api_output, general_criteria) -> float:
     """
     Estimates the kcat value at a target temperature using the Arrhenius equation, based on available experimental data.
@@ -15,23 +35,6 @@ def arrhenius_equation(candidate, api_output, general_criteria) -> float:
         float: Estimated kcat value at the objective temperature, calculated using the Arrhenius equation.
     """
 
-    def calculate_kcat(temp_obj, ea, kcat_ref, temp_ref): 
-        """
-        Calculates the catalytic rate constant (kcat) at a given temperature using the Arrhenius equation.
-
-        Parameters: 
-            temp_obj (float): The target temperature (in Kelvin) at which to calculate kcat.
-            ea (float): The activation energy calculated using find_ea(). 
-            kcat_ref (float): The reference kcat value measured at temp_ref.
-            temp_ref (float): The reference temperature (in Kelvin) at which kcat_ref was measured.
-
-        Returns: 
-            float: The calculated kcat value at temp_obj.
-        """
-        r = 8.314
-        kcat_obj = kcat_ref * np.exp(ea / r * (1/temp_ref - 1/temp_obj))
-        return kcat_obj
-
     # Objective temperature
     obj_temp = np.mean(general_criteria["Temperature"]) + 273.15
 
@@ -72,8 +75,6 @@ def calculate_ea(df) -> float:
         float: Estimated activation energy (Ea) in J/mol. 
     """
 
-    r = 8.314  # Gas constant in J/(mol*K)
-
     # Filter out rows with missing values
     valid = df[['Temperature', 'value']].dropna()
 
@@ -92,6 +93,6 @@ def calculate_ea(df) -> float:
     r2 = 1 - ss_res / ss_tot if ss_tot != 0 else np.nan
         
     # Activation energy 
-    ea = float(-slope * r)
+    ea = float(-slope * R)
 
     return ea, r2, n 
\ No newline at end of file